@@ -2,20 +2,26 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import functools
 import json
 import logging
-import sys
+from itertools import groupby
 from logging import FileHandler, Formatter
+from operator import itemgetter
 
-import babel
+import babel.dates
 import dateutil.parser
 from flask import (Flask, Response, abort, flash, redirect, render_template,
                    request, url_for)
+from flask_caching import Cache
 from flask_migrate import Migrate
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import Form
-from sqlalchemy.orm import joinedload
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import and_, bindparam, func, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import raiseload
 
 from common.models import Artist, Show, Venue, db
 from common.utils import convert_genres
@@ -29,40 +35,56 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object("config")
 
+# Cache compiled templates between renders and worker restarts
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+app.jinja_env.cache_size = 400
+app.jinja_env.auto_reload = app.debug
+
 # Initialize the app with SQLAlchemy
 db.init_app(app)
 
-with app.app_context():
-    db.create_all()
+cache = Cache(app)
 
 migrate = Migrate(app, db)
 
 
+@app.cli.command("create-extensions")
+def create_extensions():
+    """Create the PostgreSQL extensions needed by the name search indexes."""
+    db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    db.session.commit()
+
+
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
 
+# Babel patterns parsed once instead of on every filter call
+DATETIME_PATTERNS = {
+    "full": babel.dates.parse_pattern("EEEE MMMM d, y 'at' h:mma"),
+    "medium": babel.dates.parse_pattern("EEE MMM d, y h:mma"),
+}
+
+
+@functools.lru_cache(maxsize=4096)
 def format_datetime(value, format="medium"):
     # If value is already a datetime object, no need to parse
-    if isinstance(value, str):
+    if isinstance(value, datetime):
+        date = value
+    elif isinstance(value, str):
         try:
             date = dateutil.parser.parse(value)
         except ValueError:
             raise TypeError(f"Unable to parse the date string: {value}")
-    elif isinstance(value, datetime):
-        date = value
     else:
         raise TypeError(f"Expected a string or datetime object, got {type(value)}")
 
-    # Set format strings
-    if format == "full":
-        format = "EEEE MMMM d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EEE MMM d, y h:mma"
+    # Precompiled patterns for full/medium, anything else goes to Babel as is
+    pattern = DATETIME_PATTERNS.get(format, format)
 
     # Format the datetime using Babel
-    return babel.dates.format_datetime(date, format, locale="en")
+    return babel.dates.format_datetime(date, pattern, locale="en")
 
 
 app.jinja_env.filters["datetime"] = format_datetime
@@ -86,34 +108,28 @@ def venues():
     data = []
     current_time = datetime.now()  # Make this timezone aware if needed
 
-    # Get all venues with related shows
-    venueLocList = (
-        Venue.query.distinct(Venue.state, Venue.city)
-        .options(joinedload(Venue.shows))  # Eager load shows to avoid N+1 queries
+    # Count upcoming shows per venue in a single aggregated query
+    venueRows = (
+        db.session.query(
+            Venue.state, Venue.city, Venue.id, Venue.name, func.count(Show.id)
+        )
+        .outerjoin(
+            Show, and_(Show.venue_id == Venue.id, Show.start_time > current_time)
+        )
+        .group_by(Venue.state, Venue.city, Venue.id, Venue.name)
+        .order_by(Venue.state, Venue.city)
         .all()
     )
 
-    for venueLocation in venueLocList:
-        city = venueLocation.city
-        state = venueLocation.state
-
-        venues = []
-
-        venueList = Venue.query.filter_by(city=city, state=state).all()
-
-        for venue in venueList:
-            # Get upcoming shows directly from the database
-            upcomingShowsCount = Show.query.filter(
-                Show.venue_id == venue.id, Show.start_time > current_time
-            ).count()
-
-            venues.append(
-                {
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": upcomingShowsCount,
-                }
-            )
+    for (state, city), rows in groupby(venueRows, key=itemgetter(0, 1)):
+        venues = [
+            {
+                "id": venueId,
+                "name": venueName,
+                "num_upcoming_shows": upcomingShowsCount,
+            }
+            for _, _, venueId, venueName, upcomingShowsCount in rows
+        ]
 
         data.append({"city": city, "state": state, "venues": venues})
 
@@ -123,25 +139,31 @@ def venues():
 @app.route("/venues/search", methods=["POST"])
 def search_venues():
     searchTerm = request.form.get("search_term", "")
+    pattern = f"%{searchTerm.lower()}%"
 
-    venues = Venue.query.filter(Venue.name.ilike("%" + searchTerm + "%")).all()
-
-    data = []
     current_time = datetime.now()
 
-    for venue in venues:
-        upcomingShows = list(
-            filter(lambda show: show.start_time > current_time, venue.shows)
-        )
-        data.append(
-            {
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(upcomingShows),
-            }
+    # Fetch matches together with their upcoming show counts in one query
+    venueRows = (
+        db.session.query(Venue.id, Venue.name, func.count(Show.id))
+        .outerjoin(
+            Show, and_(Show.venue_id == Venue.id, Show.start_time > current_time)
         )
+        .filter(func.lower(Venue.name).like(bindparam("pattern", pattern)))
+        .group_by(Venue.id, Venue.name)
+        .all()
+    )
 
-    result = {"count": len(venues), "data": data}
+    data = [
+        {
+            "id": venueId,
+            "name": venueName,
+            "num_upcoming_shows": upcomingShowsCount,
+        }
+        for venueId, venueName, upcomingShowsCount in venueRows
+    ]
+
+    result = {"count": len(data), "data": data}
 
     return render_template(
         "pages/search_venues.html", results=result, search_term=searchTerm
@@ -155,7 +177,7 @@ def show_venue(venue_id):
 
     try:
 
-        venue = Venue.query.filter_by(id=venue_id).first()
+        venue = Venue.query.options(raiseload("*")).filter_by(id=venue_id).first()
         genres_list = convert_genres(venue.genres)
 
         data["id"] = venue.id
@@ -171,47 +193,53 @@ def show_venue(venue_id):
         data["seeking_talent"] = venue.seeking_talent
         data["seeking_description"] = venue.seeking_description
 
-        past_shows = []
-        upcoming_shows = []
         current_time = datetime.now()
 
-        artistShows = (
-            db.session.query(
-                Show.artist_id, Artist.name, Artist.image_link, Show.start_time
-            )
-            .filter_by(venue_id=venue.id)
-            .join(Artist)
-            .all()
-        )
+        artistShows = db.session.query(
+            Show.artist_id, Artist.name, Artist.image_link, Show.start_time
+        ).filter(Show.venue_id == venue.id).join(Artist)
 
-        for artistShow in artistShows:
-            artistId, artistName, artistImgLink, showtime = artistShow
-            artistShowRecord = {
+        # Let the database split upcoming and past shows
+        upcomingArtistShows = artistShows.filter(Show.start_time > current_time).all()
+        pastArtistShows = artistShows.filter(Show.start_time <= current_time).all()
+
+        upcoming_shows = [
+            {
                 "artist_id": artistId,
                 "artist_name": artistName,
                 "artist_image_link": artistImgLink,
                 "start_time": showtime,
             }
-            if showtime > current_time:
-                upcoming_shows.append(artistShowRecord)
-            else:
-                past_shows.append(artistShowRecord)
+            for artistId, artistName, artistImgLink, showtime in upcomingArtistShows
+        ]
+        past_shows = [
+            {
+                "artist_id": artistId,
+                "artist_name": artistName,
+                "artist_image_link": artistImgLink,
+                "start_time": showtime,
+            }
+            for artistId, artistName, artistImgLink, showtime in pastArtistShows
+        ]
 
         data["past_shows"] = past_shows
         data["upcoming_shows"] = upcoming_shows
 
         data["past_shows_count"] = len(past_shows)
         data["upcoming_shows_count"] = len(upcoming_shows)
+    except InvalidRequestError:
+        # A raiseload hit means a missing eager load, not a missing venue
+        app.logger.exception("Unexpected lazy load in show_venue")
+        raise
     except:
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in show_venue")
     if error:
         # e.g., on unsuccessful db query, flash an error instead.
         # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
         flash("An error occurred. Venue id " + str(venue_id) + " not found.")
         abort(404)
     else:
-        print("data:", data)
         return render_template("pages/show_venue.html", venue=data)
 
 
@@ -237,7 +265,7 @@ def create_venue_submission():
     except:
         db.session.rollback()
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in create_venue_submission")
     finally:
         db.session.close()
     if error:
@@ -255,14 +283,19 @@ def create_venue_submission():
 def delete_venue(venue_id):
     error = False
     try:
-        venue = Venue.query.get(venue_id)
-
-        db.session.delete(venue)
+        # Single DELETE; the database cascades to the venue's shows
+        deleted = (
+            db.session.query(Venue)
+            .filter(Venue.id == venue_id)
+            .delete(synchronize_session=False)
+        )
         db.session.commit()
+        cache.delete_memoized(_shows_page)
+        error = not deleted
     except:
         db.session.rollback()
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in delete_venue")
     finally:
         db.session.close()
     if error:
@@ -278,35 +311,48 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
+@cache.memoize(timeout=60)
+def _all_artists():
+    # Only id and name are listed, cached as plain dicts
+    return [
+        artist._asdict()
+        for artist in db.session.query(Artist.id, Artist.name).order_by(Artist.id)
+    ]
+
+
 @app.route("/artists")
 def artists():
-    return render_template(
-        "pages/artists.html", artists=Artist.query.order_by("id").all()
-    )
+    return render_template("pages/artists.html", artists=_all_artists())
 
 
 @app.route("/artists/search", methods=["POST"])
 def search_artists():
     searchTerm = request.form.get("search_term", "")
+    pattern = f"%{searchTerm.lower()}%"
 
-    artists = Artist.query.filter(Artist.name.ilike("%" + searchTerm + "%")).all()
-
-    data = []
     current_time = datetime.now()
 
-    for artist in artists:
-        upcomingShows = list(
-            filter(lambda show: show.start_time > current_time, artist.shows)
-        )
-        data.append(
-            {
-                "id": artist.id,
-                "name": artist.name,
-                "num_upcoming_shows": len(upcomingShows),
-            }
+    # Fetch matches together with their upcoming show counts in one query
+    artistRows = (
+        db.session.query(Artist.id, Artist.name, func.count(Show.id))
+        .outerjoin(
+            Show, and_(Show.artist_id == Artist.id, Show.start_time > current_time)
         )
+        .filter(func.lower(Artist.name).like(bindparam("pattern", pattern)))
+        .group_by(Artist.id, Artist.name)
+        .all()
+    )
+
+    data = [
+        {
+            "id": artistId,
+            "name": artistName,
+            "num_upcoming_shows": upcomingShowsCount,
+        }
+        for artistId, artistName, upcomingShowsCount in artistRows
+    ]
 
-    result = {"count": len(artists), "data": data}
+    result = {"count": len(data), "data": data}
 
     return render_template(
         "pages/search_artists.html", results=result, search_term=searchTerm
@@ -319,7 +365,7 @@ def show_artist(artist_id):
     data = {}
 
     try:
-        artist = Artist.query.filter_by(id=artist_id).first()
+        artist = Artist.query.options(raiseload("*")).filter_by(id=artist_id).first()
         genres_list = convert_genres(artist.genres)
 
         data["id"] = artist.id
@@ -334,40 +380,47 @@ def show_artist(artist_id):
         data["seeking_venue"] = artist.seeking_venue
         data["seeking_description"] = artist.seeking_description
 
-        past_shows = []
-        upcoming_shows = []
         current_time = datetime.now()
 
-        venueShows = (
-            db.session.query(
-                Show.venue_id, Venue.name, Venue.image_link, Show.start_time
-            )
-            .filter_by(artist_id=artist.id)
-            .join(Venue)
-            .all()
-        )
+        venueShows = db.session.query(
+            Show.venue_id, Venue.name, Venue.image_link, Show.start_time
+        ).filter(Show.artist_id == artist.id).join(Venue)
+
+        # Let the database split upcoming and past shows
+        upcomingVenueShows = venueShows.filter(Show.start_time > current_time).all()
+        pastVenueShows = venueShows.filter(Show.start_time <= current_time).all()
 
-        for venueShow in venueShows:
-            venueId, venueName, venueImgLink, showtime = venueShow
-            venueShowRecord = {
+        upcoming_shows = [
+            {
+                "venue_id": venueId,
+                "venue_name": venueName,
+                "venue_image_link": venueImgLink,
+                "start_time": showtime,
+            }
+            for venueId, venueName, venueImgLink, showtime in upcomingVenueShows
+        ]
+        past_shows = [
+            {
                 "venue_id": venueId,
                 "venue_name": venueName,
                 "venue_image_link": venueImgLink,
                 "start_time": showtime,
             }
-            if showtime > current_time:
-                upcoming_shows.append(venueShowRecord)
-            else:
-                past_shows.append(venueShowRecord)
+            for venueId, venueName, venueImgLink, showtime in pastVenueShows
+        ]
 
         data["past_shows"] = past_shows
         data["upcoming_shows"] = upcoming_shows
 
         data["past_shows_count"] = len(past_shows)
         data["upcoming_shows_count"] = len(upcoming_shows)
+    except InvalidRequestError:
+        # A raiseload hit means a missing eager load, not a missing artist
+        app.logger.exception("Unexpected lazy load in show_artist")
+        raise
     except:
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in show_artist")
     if error:
         # e.g., on unsuccessful db query, flash an error instead.
         # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
@@ -381,7 +434,7 @@ def show_artist(artist_id):
 #  ----------------------------------------------------------------
 @app.route("/artists/<int:artist_id>/edit", methods=["GET"])
 def edit_artist(artist_id):
-    artist = Artist.query.get_or_404(artist_id)
+    artist = Artist.query.options(raiseload("*")).get_or_404(artist_id)
     form = ArtistForm(obj=artist)
     return render_template("forms/edit_artist.html", form=form, artist=artist)
 
@@ -395,10 +448,12 @@ def edit_artist_submission(artist_id):
         form.populate_obj(artist)
         db.session.add(artist)
         db.session.commit()
+        cache.delete_memoized(_all_artists)
+        cache.delete_memoized(_shows_page)
     except:
         db.session.rollback()
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in edit_artist_submission")
     finally:
         db.session.close()
     if error:
@@ -414,7 +469,7 @@ def edit_artist_submission(artist_id):
 
 @app.route("/venues/<int:venue_id>/edit", methods=["GET"])
 def edit_venue(venue_id):
-    venue = Venue.query.get_or_404(venue_id)
+    venue = Venue.query.options(raiseload("*")).get_or_404(venue_id)
     form = VenueForm(obj=venue)
     return render_template("forms/edit_venue.html", form=form, venue=venue)
 
@@ -428,10 +483,11 @@ def edit_venue_submission(venue_id):
         form.populate_obj(venue)
         db.session.add(venue)
         db.session.commit()
+        cache.delete_memoized(_shows_page)
     except:
         db.session.rollback()
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in edit_venue_submission")
     finally:
         db.session.close()
     if error:
@@ -464,10 +520,11 @@ def create_artist_submission():
         form.populate_obj(artist)
         db.session.add(artist)
         db.session.commit()
+        cache.delete_memoized(_all_artists)
     except:
         db.session.rollback()
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in create_artist_submission")
     finally:
         db.session.close()
     if error:
@@ -485,11 +542,11 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 
-@app.route("/shows")
-def shows():
-    data = []
+@cache.memoize(timeout=30)
+def _shows_page(page):
+    perPage = app.config["SHOWS_PER_PAGE"]
 
-    # Query to join Show with Venue and Artist
+    # Query to join Show with Venue and Artist, one extra row tells if more follow
     shows = (
         db.session.query(
             Show.venue_id,
@@ -501,25 +558,26 @@ def shows():
         )
         .join(Venue, Show.venue_id == Venue.id)
         .join(Artist, Show.artist_id == Artist.id)
+        .order_by(Show.id)
+        .limit(perPage + 1)
+        .offset((page - 1) * perPage)
         .all()
     )
 
-    for show in shows:
-        venue_id, artist_id, start_time, venue_name, artist_name, artist_image_link = (
-            show
-        )
-        data.append(
-            {
-                "venue_id": venue_id,
-                "venue_name": venue_name,
-                "artist_id": artist_id,
-                "artist_name": artist_name,
-                "artist_image_link": artist_image_link,
-                "start_time": start_time,
-            }
-        )
+    # Labelled rows already carry the template keys, so map them straight to dicts
+    data = [show._asdict() for show in shows[:perPage]]
 
-    return render_template("pages/shows.html", shows=data)
+    return data, len(shows) > perPage
+
+
+@app.route("/shows")
+def shows():
+    page = max(request.args.get("page", 1, type=int), 1)
+    data, has_next = _shows_page(page)
+
+    return render_template(
+        "pages/shows.html", shows=data, page=page, has_next=has_next
+    )
 
 
 @app.route("/shows/create")
@@ -533,16 +591,16 @@ def create_shows():
 def create_show_submission():
     error = False
     form = ShowForm(request.form)
-    print("form:", request.form)
     try:
         show = Show()
         form.populate_obj(show)
         db.session.add(show)
         db.session.commit()
+        cache.delete_memoized(_shows_page)
     except:
         db.session.rollback()
         error = True
-        print(sys.exc_info())
+        app.logger.exception("Error in create_show_submission")
     finally:
         db.session.close()
     if error:
@@ -579,9 +637,5 @@ if not app.debug:
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
-# Ensure tables are created
-with app.app_context():
-    db.create_all()  # This will create all tables if they don't exist
-
 if __name__ == "__main__":
     app.run(debug=True)
@@ -30,7 +30,7 @@ class Venue(db.Model):
     website_link = db.Column(db.String(120))
 
     # Establish a relationship with the Show model
-    shows = db.relationship("Show", backref="Venue", lazy=True)
+    shows = db.relationship("Show", backref="Venue", lazy=True, passive_deletes=True)
 
 
 class Artist(db.Model):
@@ -55,6 +55,32 @@ class Show(db.Model):
     __tablename__ = "Show"
 
     id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
+    venue_id = db.Column(
+        db.Integer, db.ForeignKey("Venue.id", ondelete="CASCADE"), nullable=False
+    )
     artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.today())
+
+
+# ----------------------------------------------------------------------------#
+# Indexes.
+# ----------------------------------------------------------------------------#
+
+# Composite indexes for the per-venue/per-artist upcoming show lookups
+db.Index("ix_show_venue_time", Show.venue_id, Show.start_time)
+db.Index("ix_show_artist_time", Show.artist_id, Show.start_time)
+
+# Trigram indexes so substring ("%term%") searches avoid a sequential scan
+# (they need the pg_trgm extension, created by `flask create-extensions`)
+db.Index(
+    "ix_venue_lower_name_trgm",
+    db.func.lower(Venue.name).label("lower_name"),
+    postgresql_using="gin",
+    postgresql_ops={"lower_name": "gin_trgm_ops"},
+)
+db.Index(
+    "ix_artist_lower_name_trgm",
+    db.func.lower(Artist.name).label("lower_name"),
+    postgresql_using="gin",
+    postgresql_ops={"lower_name": "gin_trgm_ops"},
+)
@@ -1,11 +1,25 @@
+import functools
+
+# Array literal punctuation dropped before splitting, e.g. {"Rock n Roll",Jazz}.
+# Every quote is removed, so escaped quotes or commas inside a genre are not kept.
+_ARRAY_LITERAL_CHARS = str.maketrans("", "", '{}"')
+
+
 def convert_genres(list_input):
-    # Step 1: Join characters into a string
-    joined_string = "".join(list_input)
+    # Lists are unhashable, so key the cache on a tuple of the genres
+    if not isinstance(list_input, str):
+        list_input = tuple(list_input)
+
+    # Return a fresh list so callers never mutate the cached value
+    return list(_parse_genres(list_input))
 
-    # Step 2: Strip curly braces and split by comma
-    genres_list = joined_string.strip("{}").split(",")
 
-    # Step 3: Remove any extra spaces (if any) and clean the items
-    genres_list = [genre.strip() for genre in genres_list]
+@functools.lru_cache(maxsize=2048)
+def _parse_genres(genres_input):
+    # ARRAY columns already come back as a sequence of strings
+    if not isinstance(genres_input, str):
+        return genres_input
 
-    return genres_list
+    # Legacy rows stored as a "{a,b}" array literal: drop braces and split once
+    genres_list = genres_input.translate(_ARRAY_LITERAL_CHARS).split(",")
+    return tuple(genre.strip() for genre in genres_list)
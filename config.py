@@ -12,7 +12,7 @@ SQL_SERVER = os.environ.get("SQL_SERVER") or "localhost"
 SQL_DATABASE = os.environ.get("SQL_DATABASE") or "cd0046"
 SQL_USER_NAME = os.environ.get("SQL_USER_NAME") or "postgres"
 SQL_PASSWORD = os.environ.get("SQL_PASSWORD") or "123"
-SQL_PORT = os.environ.get("SQL_PASSWORD") or "5432"
+SQL_PORT = os.environ.get("SQL_PORT") or "5432"
 SQLALCHEMY_DATABASE_URI = (
     "postgresql://"
     + SQL_USER_NAME
@@ -25,3 +25,25 @@ SQLALCHEMY_DATABASE_URI = (
     + "/"
     + SQL_DATABASE
 )
+
+# Connection pool settings
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_recycle": 3600,
+    "pool_pre_ping": True,
+}
+
+# Disable per-object change tracking
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Cache settings. SimpleCache lives in each process, so invalidation on writes
+# only reaches the worker that served the write; set CACHE_TYPE=RedisCache and
+# CACHE_REDIS_URL to share the cache when running several workers.
+CACHE_TYPE = os.environ.get("CACHE_TYPE") or "SimpleCache"
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+CACHE_DEFAULT_TIMEOUT = 30
+
+# Number of shows listed per page
+SHOWS_PER_PAGE = 50
@@ -0,0 +1,31 @@
+import importlib
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def reload_config(monkeypatch):
+    # Restore the real environment in config even when an assertion fails
+    yield lambda: importlib.reload(config)
+    monkeypatch.undo()
+    importlib.reload(config)
+
+
+def test_sql_port_is_read_from_its_own_variable(monkeypatch, reload_config):
+    monkeypatch.setenv("SQL_PASSWORD", "secret")
+    monkeypatch.setenv("SQL_PORT", "6543")
+    reload_config()
+
+    assert config.SQL_PORT.isdigit()
+    assert config.SQL_PORT == "6543"
+
+
+def test_sql_port_defaults_to_postgres_port(monkeypatch, reload_config):
+    monkeypatch.setenv("SQL_PASSWORD", "secret")
+    monkeypatch.delenv("SQL_PORT", raising=False)
+    reload_config()
+
+    assert config.SQL_PORT.isdigit()
+    assert config.SQL_PORT == "5432"
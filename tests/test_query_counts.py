@@ -0,0 +1,125 @@
+import contextlib
+import importlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("flask_sqlalchemy")
+pytest.importorskip("psycopg2")
+
+import config
+
+# Needs a throwaway Postgres database; its tables are created and dropped here
+TEST_DATABASE = os.environ.get("SQL_TEST_DATABASE")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE, reason="SQL_TEST_DATABASE is not set")
+
+
+@contextlib.contextmanager
+def count_queries(engine):
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="module")
+def fyyur():
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv("SQL_DATABASE", TEST_DATABASE)
+    importlib.reload(config)
+
+    import app as fyyur
+
+    from common.models import Artist, Show, Venue, db
+
+    result = fyyur.app.test_cli_runner().invoke(args=["create-extensions"])
+    assert result.exit_code == 0, result.output
+
+    with fyyur.app.app_context():
+        db.create_all()
+
+        venue = Venue(
+            name="The Musical Hop",
+            city="San Francisco",
+            state="CA",
+            genres=["Jazz", "Reggae"],
+        )
+        artist = Artist(
+            name="Guns N Petals",
+            city="San Francisco",
+            state="CA",
+            genres=["Rock n Roll"],
+        )
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        for days in (-7, 7):
+            db.session.add(
+                Show(
+                    venue_id=venue.id,
+                    artist_id=artist.id,
+                    start_time=datetime.now() + timedelta(days=days),
+                )
+            )
+        db.session.commit()
+        ids = {"venue": venue.id, "artist": artist.id}
+
+    yield fyyur, db, ids
+
+    with fyyur.app.app_context():
+        db.session.remove()
+        db.drop_all()
+    monkeypatch.undo()
+    importlib.reload(config)
+
+
+def test_venues_query_count(fyyur):
+    fyyur, db, ids = fyyur
+    client = fyyur.app.test_client()
+
+    with fyyur.app.app_context():
+        with count_queries(db.engine) as statements:
+            response = client.get("/venues")
+
+    assert response.status_code == 200
+    assert b"The Musical Hop" in response.data
+    assert len(statements) <= 2, statements
+
+
+@pytest.mark.parametrize("kind, term", [("venue", "musical"), ("artist", "petals")])
+def test_search_query_count(fyyur, kind, term):
+    fyyur, db, ids = fyyur
+    client = fyyur.app.test_client()
+
+    with fyyur.app.app_context():
+        with count_queries(db.engine) as statements:
+            response = client.post(f"/{kind}s/search", data={"search_term": term})
+
+    assert response.status_code == 200
+    assert b": 1</h3>" in response.data
+    assert len(statements) <= 2, statements
+
+
+@pytest.mark.parametrize("kind", ["venue", "artist"])
+def test_detail_page_query_count(fyyur, kind):
+    fyyur, db, ids = fyyur
+    client = fyyur.app.test_client()
+
+    with fyyur.app.app_context():
+        with count_queries(db.engine) as statements:
+            response = client.get(f"/{kind}s/{ids[kind]}")
+
+    assert response.status_code == 200
+    assert b"1 Upcoming Show" in response.data
+    assert b"1 Past Show" in response.data
+    # One entity lookup plus the upcoming and past show queries
+    assert len(statements) <= 3, statements